@@ -40,6 +40,12 @@ parser.add_argument(
     action="store_true",
     help="vertically flip the camera's image"
 )
+parser.add_argument(
+    "--feed_port",
+    default=None,
+    type=int,
+    help="serve raw received packets on this TCP port for relay nodes",
+)
 
 # Arguments for radio
 parser.add_argument("--spi_bus", default=0, help="Which SPI Bus you're using")
@@ -52,4 +58,66 @@ parser.add_argument("--modulation_sf", default=10)
 parser.add_argument("--modulation_bw", default=500_000, help="Bandwidth")
 parser.add_argument("--modulation_cr", default=8)
 parser.add_argument("--preamble_len", default=12)
-parser.add_argument("--sync_word", default=0x34)
\ No newline at end of file
+parser.add_argument("--sync_word", default=0x34)
+
+# add arguments for relay node command line interface
+relay_parser = argparse.ArgumentParser(
+    prog="relay",
+    description="Merges the packet feeds of several ground stations",
+)
+
+relay_parser.add_argument(
+    "-s", "--sources",
+    required=True,
+    help="comma separated host:port raw packet feeds of each ground station",
+)
+relay_parser.add_argument(
+    "-a", "--address",
+    default="0.0.0.0",
+    help="Server host address, default to all external hosts"
+)
+relay_parser.add_argument("-p", "--port", default=8765, type=int, help="server port")
+relay_parser.add_argument(
+    "-n",
+    "--server-name",
+    default="ground control relay",
+    help="server name"
+)
+relay_parser.add_argument("-r", "--rocket-name", default="TOM", help="rocket name")
+relay_parser.add_argument(
+    "-l",
+    "--enable_logging",
+    action="store_true",
+    help="enable logging on relay",
+)
+relay_parser.add_argument("-d", "--log_dir", default="logs")
+relay_parser.add_argument(
+    "--feed_port",
+    default=None,
+    type=int,
+    help="re-serve the merged raw packets on this TCP port",
+)
+relay_parser.add_argument(
+    "--merge_window_ms",
+    default=150,
+    type=int,
+    help="how long to wait for copies from other stations before publishing",
+)
+relay_parser.add_argument(
+    "--dedup_window_s",
+    default=5.0,
+    type=float,
+    help="identical packets within this window are treated as duplicates",
+)
+relay_parser.add_argument(
+    "--buffer_size",
+    default=1024,
+    type=int,
+    help="maximum number of packets buffered between sources and the merger",
+)
+relay_parser.add_argument(
+    "--stats_interval",
+    default=5.0,
+    type=float,
+    help="seconds between per-source statistics reports",
+)
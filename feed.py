@@ -0,0 +1,199 @@
+"""Raw packet feed shared between ground stations and the relay node"""
+import argparse
+from base64 import b64decode
+from dataclasses import dataclass
+from queue import Queue, Empty, Full
+import select
+import socket
+import socketserver
+import struct
+import threading
+import time
+from threading import Event
+from typing import Optional
+
+# rx_time_ns, rssi, snr, payload length
+FRAME_HEADER = struct.Struct("!qffH")
+
+# Frames waiting to be sent to a single slow client before dropping
+CLIENT_BUFFER_SIZE = 256
+
+
+@dataclass
+class RawPacket:
+    data: bytes
+    rssi: float
+    snr: float
+    rx_time_ns: int
+
+
+def encode_frame(packet: RawPacket) -> bytes:
+    header = FRAME_HEADER.pack(
+        packet.rx_time_ns, packet.rssi, packet.snr, len(packet.data)
+    )
+    return header + packet.data
+
+
+def _recv_exact(sock: socket.socket, size: int) -> Optional[bytes]:
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            return None
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+def read_frame(sock: socket.socket) -> Optional[RawPacket]:
+    """
+    Read a single frame from the socket. Returns None once the peer has
+    closed the connection.
+    """
+    header = _recv_exact(sock, FRAME_HEADER.size)
+    if header is None:
+        return None
+    rx_time_ns, rssi, snr, length = FRAME_HEADER.unpack(header)
+    data = _recv_exact(sock, length)
+    if data is None:
+        return None
+    return RawPacket(data=data, rssi=rssi, snr=snr, rx_time_ns=rx_time_ns)
+
+
+class _FeedHandler(socketserver.BaseRequestHandler):
+    server: "_FeedTCPServer"
+
+    def handle(self) -> None:
+        feed = self.server.feed
+        queue: Queue = Queue(maxsize=CLIENT_BUFFER_SIZE)
+        feed._add_client(queue)
+        print(f"[INFO] Feed client connected from {self.client_address[0]}:{self.client_address[1]}")
+        try:
+            while not feed.stop_event.is_set():
+                try:
+                    frame = queue.get(timeout=1.0)
+                except Empty:
+                    # Clients never send data, so a readable socket on an
+                    # idle feed means the client has hung up
+                    readable, _, _ = select.select([self.request], [], [], 0)
+                    if readable and not self.request.recv(4096):
+                        break
+                    continue
+                self.request.sendall(frame)
+        except OSError:
+            pass
+        finally:
+            feed._remove_client(queue)
+            print(f"[INFO] Feed client {self.client_address[0]}:{self.client_address[1]} disconnected")
+
+
+class _FeedTCPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], feed: "FeedServer") -> None:
+        self.feed = feed
+        super().__init__(address, _FeedHandler)
+
+
+class FeedServer:
+    """
+    Serves received packets to any number of TCP subscribers, such as a
+    relay node. Each client has a bounded buffer; frames for a client that
+    cannot keep up are dropped rather than blocking the radio.
+    """
+
+    def __init__(self, host: str, port: int) -> None:
+        self.stop_event = Event()
+        self._clients: set[Queue] = set()
+        self._lock = threading.Lock()
+        self._server = _FeedTCPServer((host, port), self)
+        self._thread = threading.Thread(
+            target=self._server.serve_forever,
+            name="feed-server",
+            daemon=True,
+        )
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    @property
+    def client_count(self) -> int:
+        with self._lock:
+            return len(self._clients)
+
+    def start(self) -> "FeedServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.stop_event.set()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def publish(self, packet: RawPacket) -> None:
+        frame = encode_frame(packet)
+        with self._lock:
+            clients = list(self._clients)
+        for queue in clients:
+            try:
+                queue.put_nowait(frame)
+            except Full:
+                pass
+
+    def _add_client(self, queue: Queue) -> None:
+        with self._lock:
+            self._clients.add(queue)
+
+    def _remove_client(self, queue: Queue) -> None:
+        with self._lock:
+            self._clients.discard(queue)
+
+
+def main() -> None:
+    """
+    Replay a log of base64 encoded packets as a feed, so relays can be
+    exercised on loopback without a radio.
+    """
+    parser = argparse.ArgumentParser(description="Replay a packet log as a raw packet feed.")
+    parser.add_argument("filename", help="file with one base64 encoded packet per line")
+    parser.add_argument("-a", "--address", default="127.0.0.1")
+    parser.add_argument("-p", "--port", default=9000, type=int)
+    parser.add_argument("--rate", default=10.0, type=float, help="packets per second")
+    parser.add_argument("--rssi", default=-80.0, type=float)
+    parser.add_argument("--snr", default=5.0, type=float)
+    parser.add_argument("--loop", action="store_true", help="restart at the end of the file")
+    args = parser.parse_args()
+
+    with open(args.filename) as file:
+        packets = [
+            b64decode(line)
+            for line in file.readlines()
+            if len(line.strip()) > 0 and not line.startswith("#")
+        ]
+
+    feed = FeedServer(args.address, args.port).start()
+    print(f"[INFO] Replaying {len(packets)} packets on {args.address}:{feed.port}")
+
+    try:
+        while feed.client_count == 0:
+            time.sleep(0.1)
+        while True:
+            for data in packets:
+                feed.publish(RawPacket(
+                    data=data,
+                    rssi=args.rssi,
+                    snr=args.snr,
+                    rx_time_ns=time.time_ns(),
+                ))
+                time.sleep(1.0 / args.rate)
+            if not args.loop:
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        feed.stop()
+
+
+if __name__ == "__main__":
+    main()
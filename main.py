@@ -1,38 +1,38 @@
+from __future__ import annotations
+
 # Native python imports
+import time
+
+# Taken before any heavy imports so time-to-first-packet includes them
+PROCESS_START = time.monotonic()
+
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import logging
 import os
 from queue import Queue, Empty, Full
 import threading
-from typing import Dict, Optional
+from typing import TYPE_CHECKING, Dict, Optional
 from dataclasses import dataclass
 from threading import Event
 
-# External library imports for lora and foxglove foxglove, logging, etc.
-import cv2
-import foxglove
-from foxglove import Channel, Schema
-from foxglove.channels import CompressedImageChannel
-from foxglove.websocket import (
-    Capability,
-    WebSocketServer,
-)
-from foxglove.schemas import (
-    CompressedImage,
-)
-import google.protobuf.message
-import board
-import busio
-import digitalio
-from adafruit_rfm9x import RFM9x
-
-# Local imports for custom protobuf schema and CLI
+# Local imports for CLI and raw packet feed
 from cli import parser
-from TomPacket_pb2 import TomPacket
-from LocationFix_pb2 import LocationFix
-from Signal_pb2 import Signal
+from feed import FeedServer, RawPacket
+
+# cv2, foxglove, the protobuf schemas and the Blinka stack are slow to import,
+# so they are imported where they are first needed. This lets the radio come
+# up and start buffering packets before anything else is loaded.
+if TYPE_CHECKING:
+    import cv2
+    from adafruit_rfm9x import RFM9x
+    from foxglove import Channel
+    from foxglove.channels import CompressedImageChannel
+    from foxglove.websocket import WebSocketServer
+
+# Packets received while the server and camera are still starting up
+PACKET_BUFFER_SIZE = 1024
 
-from utils import build_file_descriptor_set, CustomListener
 
 @dataclass
 class ChannelData:
@@ -40,123 +40,159 @@ class ChannelData:
     stop_event: Event
     thread: Optional[threading.Thread] = None
 
+
 def channel_publisher(queue: Queue, channel: Channel, stop_event: Event, name: str) -> None:
     while not stop_event.is_set():
         try:
-            data = queue.get(timeout=1.0)
-            channel.log(data)
+            data, log_time = queue.get(timeout=1.0)
+            channel.log(data, log_time=log_time)
         except Empty:
             continue
 
-def lora_reader(lora: RFM9x, rocket_channels: Dict, stop_event: Event) -> None:
+def lora_reader(lora: RFM9x, packet_queue: Queue, stop_event: Event) -> None:
+    first_packet = True
     while not stop_event.is_set():
         packet = lora.receive(with_header=True)
         if packet is not None:
             print(bytes(packet))
+            if first_packet:
+                first_packet = False
+                print(f"[INFO] Time to first packet: {time.monotonic() - PROCESS_START:.2f}s")
+            raw_packet = RawPacket(
+                data=bytes(packet),
+                rssi=lora.last_rssi,
+                snr=lora.last_snr,
+                rx_time_ns=time.time_ns(),
+            )
             try:
-                tom_packet = TomPacket()
-                tom_packet.ParseFromString(packet)
-
-                if tom_packet.rocket_id not in rocket_channels:
-                    continue
-
-                if abs(tom_packet.location.altitude) > 1_000_000:
-                    continue
-
-                # Get the channels for the specific rocket
-                channels = rocket_channels[tom_packet.rocket_id]
-
-                # Queue location data
-                if tom_packet.HasField("location"):
-                    try:
-                        channels["location"]["data"].queue.put(
-                            tom_packet.location.SerializeToString(), timeout=0.1
-                        )
-                    except Full:
-                        print(f"[WARNING] Location queue for rocket {tom_packet.rocket_id} is full. Dropping message.")
-
-                # Queue telemetry data
-                try:
-                    channels["telemetry"]["data"].queue.put(bytes(packet), timeout=0.1)
-                except Full:
-                    print(f"[WARNING] Telemetry queue for rocket {tom_packet.rocket_id} is full. Dropping message.")
-
-                # Queue signal data
-                signal_data = Signal(rssi=lora.last_rssi, snr=lora.last_snr)
-                try:
-                    channels["signal"]["data"].queue.put(
-                        signal_data.SerializeToString(), timeout=0.1
-                    )
-                except Full:
-                    print(f"[WARNING] Signal queue for rocket {tom_packet.rocket_id} is full. Dropping message.")
-            except google.protobuf.message.DecodeError:
-                print("[ERROR] Could not decode packet! Did flight computer shut off?")
+                packet_queue.put_nowait(raw_packet)
+            except Full:
+                print("[WARNING] Packet buffer is full. Dropping packet.")
+
+def route_packet(packet: RawPacket, rocket_channels: Dict) -> None:
+    import google.protobuf.message
+    from TomPacket_pb2 import TomPacket
+    from Signal_pb2 import Signal
+
+    try:
+        tom_packet = TomPacket()
+        tom_packet.ParseFromString(packet.data)
+
+        if tom_packet.rocket_id not in rocket_channels:
+            return
+
+        if abs(tom_packet.location.altitude) > 1_000_000:
+            return
+
+        # Get the channels for the specific rocket
+        channels = rocket_channels[tom_packet.rocket_id]
+
+        # Queue location data
+        if tom_packet.HasField("location"):
+            try:
+                channels["location"]["data"].queue.put(
+                    (tom_packet.location.SerializeToString(), packet.rx_time_ns),
+                    timeout=0.1,
+                )
+            except Full:
+                print(f"[WARNING] Location queue for rocket {tom_packet.rocket_id} is full. Dropping message.")
+
+        # Queue telemetry data
+        try:
+            channels["telemetry"]["data"].queue.put((packet.data, packet.rx_time_ns), timeout=0.1)
+        except Full:
+            print(f"[WARNING] Telemetry queue for rocket {tom_packet.rocket_id} is full. Dropping message.")
+
+        # Queue signal data
+        signal_data = Signal(rssi=packet.rssi, snr=packet.snr)
+        try:
+            channels["signal"]["data"].queue.put(
+                (signal_data.SerializeToString(), packet.rx_time_ns),
+                timeout=0.1,
+            )
+        except Full:
+            print(f"[WARNING] Signal queue for rocket {tom_packet.rocket_id} is full. Dropping message.")
+    except google.protobuf.message.DecodeError:
+        print("[ERROR] Could not decode packet! Did flight computer shut off?")
+
+def packet_router(
+    packet_queue: Queue,
+    rocket_channels: Dict,
+    stop_event: Event,
+    feed: FeedServer | None = None,
+) -> None:
+    while not stop_event.is_set():
+        try:
+            packet = packet_queue.get(timeout=1.0)
+        except Empty:
+            continue
+        route_packet(packet, rocket_channels)
+        if feed is not None:
+            feed.publish(packet)
 
 def camera_reader(cap: cv2.VideoCapture, image_queue: Queue, stop_event: Event) -> None:
+    import cv2
+    from foxglove.schemas import CompressedImage
+
     while not stop_event.is_set():
         ret, frame = cap.read()
         if ret:
+            capture_time_ns = time.time_ns()
             im_packet = CompressedImage(
                 data=cv2.imencode(".jpeg", frame)[1].tobytes(),
                 format="jpeg"
             )
             try:
-                image_queue.put(im_packet, timeout=0.1)
+                image_queue.put((im_packet, capture_time_ns), timeout=0.1)
             except Full:
                 print("[WARNING] Image queue is full. Dropping frame.")
                 image_queue.pop()
-                image_queue.put(im_packet, timeout=0.1)
-def run_telemetry_loop(
-    lora: RFM9x,
-    server: WebSocketServer,
-    image_channel: CompressedImageChannel | None = None,
-    cap: cv2.VideoCapture | None = None,
-    rocket_ids: list[str] = [],
-) -> None:
+                image_queue.put((im_packet, capture_time_ns), timeout=0.1)
+
+def build_protobuf_channel(topic: str, message_class):
+    from foxglove import Channel, Schema
+    from utils import build_file_descriptor_set
+
+    return Channel(
+        topic=topic,
+        message_encoding="protobuf",
+        schema=Schema(
+            name=message_class.DESCRIPTOR.full_name,
+            encoding="protobuf",
+            data=build_file_descriptor_set(message_class).SerializeToString(),
+        ),
+    )
+
+def build_rocket_channels(
+    rocket_ids: list[str],
+    maxsize: int = 0,
+) -> Dict[str, Dict[str, dict]]:
+    from TomPacket_pb2 import TomPacket
+    from LocationFix_pb2 import LocationFix
+    from Signal_pb2 import Signal
+
     # Create a dictionary to store channels and their queues for each rocket
     rocket_channels: Dict[str, Dict[str, dict]] = {}
-    
+
     for rocket_id in rocket_ids:
         rocket_channels[rocket_id] = {
             "telemetry": {
-                "channel": Channel(
-                    topic=f"/telemetry/{rocket_id}",
-                    message_encoding="protobuf",
-                    schema=Schema(
-                        name=TomPacket.DESCRIPTOR.full_name,
-                        encoding="protobuf",
-                        data=build_file_descriptor_set(TomPacket).SerializeToString(),
-                    ),
-                ),
-                "data": ChannelData(Queue(), Event())
+                "channel": build_protobuf_channel(f"/telemetry/{rocket_id}", TomPacket),
+                "data": ChannelData(Queue(maxsize), Event())
             },
             "location": {
-                "channel": Channel(
-                    topic=f"/location/{rocket_id}",
-                    message_encoding="protobuf",
-                    schema=Schema(
-                        name=LocationFix.DESCRIPTOR.full_name,
-                        encoding="protobuf",
-                        data=build_file_descriptor_set(LocationFix).SerializeToString(),
-                    ),
-                ),
-                "data": ChannelData(Queue(), Event())
+                "channel": build_protobuf_channel(f"/location/{rocket_id}", LocationFix),
+                "data": ChannelData(Queue(maxsize), Event())
             },
             "signal": {
-                "channel": Channel(
-                    topic=f"/signal/{rocket_id}",
-                    message_encoding="protobuf",
-                    schema=Schema(
-                        name=Signal.DESCRIPTOR.full_name,
-                        encoding="protobuf",
-                        data=build_file_descriptor_set(Signal).SerializeToString(),
-                    ),
-                ),
-                "data": ChannelData(Queue(), Event())
+                "channel": build_protobuf_channel(f"/signal/{rocket_id}", Signal),
+                "data": ChannelData(Queue(maxsize), Event())
             },
         }
 
-    # Start publisher threads for each channel
+    return rocket_channels
+
+def start_channel_publishers(rocket_channels: Dict[str, Dict[str, dict]]) -> None:
     for rocket_id, channels in rocket_channels.items():
         for channel_name, channel_info in channels.items():
             thread = threading.Thread(
@@ -172,14 +208,35 @@ def run_telemetry_loop(
             channel_info["data"].thread = thread
             thread.start()
 
-    # Create and start LoRa reader thread
-    lora_stop_event = Event()
-    lora_thread = threading.Thread(
-        target=lora_reader,
-        args=(lora, rocket_channels, lora_stop_event),
-        name="lora-reader"
+def stop_channel_publishers(rocket_channels: Dict[str, Dict[str, dict]]) -> None:
+    for rocket_id, channels in rocket_channels.items():
+        for channel_info in channels.values():
+            channel_info["data"].stop_event.set()
+            if channel_info["data"].thread:
+                channel_info["data"].thread.join()
+
+def run_telemetry_loop(
+    packet_queue: Queue,
+    server: WebSocketServer,
+    image_channel: CompressedImageChannel | None = None,
+    cap: cv2.VideoCapture | None = None,
+    rocket_ids: list[str] = [],
+    feed: FeedServer | None = None,
+) -> None:
+    rocket_channels = build_rocket_channels(rocket_ids)
+
+    # Start publisher threads for each channel
+    start_channel_publishers(rocket_channels)
+
+    # Create and start the router thread, which drains packets buffered by
+    # the LoRa reader since startup
+    router_stop_event = Event()
+    router_thread = threading.Thread(
+        target=packet_router,
+        args=(packet_queue, rocket_channels, router_stop_event, feed),
+        name="packet-router"
     )
-    lora_thread.start()
+    router_thread.start()
 
     # Create image publisher thread if camera is enabled
     image_queue = None
@@ -189,7 +246,7 @@ def run_telemetry_loop(
         image_queue = Queue()
         image_stop_event = Event()
         camera_stop_event = Event()
-        
+
         # Start image publisher thread
         image_thread = threading.Thread(
             target=channel_publisher,
@@ -197,7 +254,7 @@ def run_telemetry_loop(
             name="image-publisher"
         )
         image_thread.start()
-        
+
         # Start camera reader thread
         camera_thread = threading.Thread(
             target=camera_reader,
@@ -206,23 +263,21 @@ def run_telemetry_loop(
         )
         camera_thread.start()
 
+    print(f"[INFO] Publishing telemetry ({time.monotonic() - PROCESS_START:.2f}s after start)")
+
     try:
         # Main thread just waits for interrupt
         while True:
             threading.Event().wait(1)
-            
+
     except KeyboardInterrupt:
         print("\nShutting down threads...")
-        # Stop all publisher threads
-        for rocket_id, channels in rocket_channels.items():
-            for channel_info in channels.values():
-                channel_info["data"].stop_event.set()
-                if channel_info["data"].thread:
-                    channel_info["data"].thread.join()
+        # Stop router thread
+        router_stop_event.set()
+        router_thread.join()
 
-        # Stop LoRa thread
-        lora_stop_event.set()
-        lora_thread.join()
+        # Stop all publisher threads
+        stop_channel_publishers(rocket_channels)
 
         # Stop camera and image threads if they exist
         if camera_stop_event:
@@ -235,10 +290,37 @@ def run_telemetry_loop(
         server.stop()
 
 
-def main() -> None:
-    args = parser.parse_args()
+def init_lora(args) -> RFM9x:
+    import board
+    import busio
+    import digitalio
+    from adafruit_rfm9x import RFM9x
+
+    # LoRa Wiring settings
+    spi = busio.SPI(board.SCK, MOSI=board.MOSI, MISO=board.MISO)
+
+    # Setup Chip Select and Reset pins
+    cs = digitalio.DigitalInOut(getattr(board, f"CE{args.spi_cs}"))
+    reset = digitalio.DigitalInOut(getattr(board, f"D{args.pins_reset}"))
+
+    # Initialize RFM9x
+    lora = RFM9x(spi, cs, reset, args.frequency / 1_000_000)
+
+    # Apply modulation settings
+    lora.signal_bandwidth = args.modulation_bw
+    lora.spreading_factor = args.modulation_sf
+    lora.coding_rate = args.modulation_cr
+    lora.preamble_length = args.preamble_len
+    lora.sync_word = args.sync_word
+
+    return lora
+
+
+def start_server(args) -> WebSocketServer:
+    import foxglove
+    from foxglove.websocket import Capability
+    from utils import CustomListener
 
-    # INITIALIZE FOXGLOVE SERVER
     foxglove.set_log_level(logging.DEBUG)
 
     listener = CustomListener()
@@ -251,92 +333,96 @@ def main() -> None:
         capabilities=[Capability.ClientPublish],
         supported_encodings=["json", "protobuf"],
     )
+    print("[INFO] Foxglove server started")
+    return server
 
-    telemetry_channel = Channel(
-        topic="/telemetry",
-        message_encoding="protobuf",
-        schema=Schema(
-            name=TomPacket.DESCRIPTOR.full_name,
-            encoding="protobuf",
-            data=build_file_descriptor_set(TomPacket).SerializeToString(),
-        ),
-    )
 
-    location_channel = Channel(
-        topic="/location",
-        message_encoding="protobuf",
-        schema=Schema(
-            name=LocationFix.DESCRIPTOR.full_name,
-            encoding="protobuf",
-            data=build_file_descriptor_set(LocationFix).SerializeToString(),
-        ),
-    )
+def open_camera(args) -> cv2.VideoCapture | None:
+    # Only pay for the cv2 import when the camera is actually enabled
+    import cv2
 
-    signal_channel = Channel(
-        topic="/signal",
-        message_encoding="protobuf",
-        schema=Schema(
-            name=Signal.DESCRIPTOR.full_name,
-            encoding="protobuf",
-            data=build_file_descriptor_set(Signal).SerializeToString(),
-        ),
-    )
+    cap = cv2.VideoCapture(0)
+    if not cap.isOpened():
+        print("[ERROR] Could not open camera")
+        return None
+    print("[INFO] Initialized Video Camera")
+    return cap
 
-    if args.enable_camera:
-        image_channel = CompressedImageChannel(topic="/camera/image_compressed")
-    else:
-        image_channel = None
 
-    # INITIALIZE IO RESOURCES
-    # LoRa Wiring settings
-    spi = busio.SPI(board.SCK, MOSI=board.MOSI, MISO=board.MISO)
-
-    # Setup Chip Select and Reset pins
-    cs = digitalio.DigitalInOut(getattr(board, f"CE{args.spi_cs}"))
-    reset = digitalio.DigitalInOut(getattr(board, f"D{args.pins_reset}"))
+def main() -> None:
+    args = parser.parse_args()
 
-    # Initialize RFM9x
-    lora = RFM9x(spi, cs, reset, args.frequency / 1_000_000)
+    # INITIALIZE RADIO FIRST
+    # Packets are buffered from here on while everything else starts up
+    lora = init_lora(args)
+    print(f"[INFO] LoRa initialized ({time.monotonic() - PROCESS_START:.2f}s after start)")
 
-    # Apply modulation settings
-    lora.signal_bandwidth = args.modulation_bw
-    lora.spreading_factor = args.modulation_sf
-    lora.coding_rate = args.modulation_cr
-    lora.preamble_length = args.preamble_len
-    lora.sync_word = args.sync_word
+    packet_queue: Queue = Queue(maxsize=PACKET_BUFFER_SIZE)
+    lora_stop_event = Event()
+    lora_thread = threading.Thread(
+        target=lora_reader,
+        args=(lora, packet_queue, lora_stop_event),
+        name="lora-reader"
+    )
+    lora_thread.start()
 
-    print("[INFO] LoRa initialized")
+    # Raw packet feed for relay nodes, see relay.py
+    if args.feed_port is not None:
+        feed = FeedServer(args.address, args.feed_port).start()
+        print(f"[INFO] Raw packet feed on port {feed.port}")
+    else:
+        feed = None
 
-    # Video capture initialization
-    if args.enable_camera:
-        cap = cv2.VideoCapture(0)
-        if not cap.isOpened():
-            print("[ERROR] Could not open camera")
-            cap = None
-            image_channel = None
+    try:
+        # INITIALIZE FOXGLOVE SERVER AND CAMERA CONCURRENTLY
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="startup") as executor:
+            server_future = executor.submit(start_server, args)
+            camera_future = executor.submit(open_camera, args) if args.enable_camera else None
+            server = server_future.result()
+            cap = camera_future.result() if camera_future is not None else None
+
+        # Deferred until the server is up so schema building doesn't delay it
+        from foxglove.channels import CompressedImageChannel
+        from TomPacket_pb2 import TomPacket
+        from LocationFix_pb2 import LocationFix
+        from Signal_pb2 import Signal
+
+        telemetry_channel = build_protobuf_channel("/telemetry", TomPacket)
+        location_channel = build_protobuf_channel("/location", LocationFix)
+        signal_channel = build_protobuf_channel("/signal", Signal)
+
+        if cap is not None:
+            image_channel = CompressedImageChannel(topic="/camera/image_compressed")
         else:
-            print("[INFO] Initialized Video Camera")
-    else:
-        cap = None
+            image_channel = None
+
+        rocket_ids = args.rocket_name.split(',')
 
-    rocket_ids = args.rocket_name.split(',')
+        if args.enable_logging:
+            import foxglove
 
-    if args.enable_logging:
-        # Create logs directory if it doesn't exist
-        os.makedirs(args.log_dir, exist_ok=True)
+            # Create logs directory if it doesn't exist
+            os.makedirs(args.log_dir, exist_ok=True)
 
-        # Create filename with current datetime
-        timestamp = datetime.now().strftime("%Y:%m:%d-%H:%M:%S")
-        path = os.path.join(args.log_dir, f"{args.rocket_name}-{timestamp}.mcap")
+            # Create filename with current datetime
+            timestamp = datetime.now().strftime("%Y:%m:%d-%H:%M:%S")
+            path = os.path.join(args.log_dir, f"{args.rocket_name}-{timestamp}.mcap")
 
-        with foxglove.open_mcap(path):
+            with foxglove.open_mcap(path):
+                run_telemetry_loop(
+                    packet_queue, server, image_channel, cap, rocket_ids, feed
+                )
+        else:
             run_telemetry_loop(
-                lora, server, image_channel, cap, rocket_ids
+                packet_queue, server, image_channel, cap, rocket_ids, feed
             )
-    else:
-        run_telemetry_loop(
-            lora, server, image_channel, cap, rocket_ids
-        )
+    finally:
+        # Stop LoRa thread
+        lora_stop_event.set()
+        lora_thread.join()
+
+        if feed is not None:
+            feed.stop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,358 @@
+"""Relay node that merges the raw packet feeds of several ground stations"""
+from __future__ import annotations
+
+# Native python imports
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from datetime import datetime
+import json
+import os
+from queue import Queue, Empty, Full
+import select
+import socket
+import threading
+import time
+from threading import Event
+from typing import TYPE_CHECKING, Dict, Optional
+
+# Local imports for CLI, raw packet feed and shared ground station plumbing
+from cli import relay_parser
+from feed import FeedServer, RawPacket, read_frame
+from main import (
+    build_rocket_channels,
+    route_packet,
+    start_channel_publishers,
+    start_server,
+    stop_channel_publishers,
+)
+
+if TYPE_CHECKING:
+    from foxglove.websocket import WebSocketServer
+
+# Released packets remembered for deduplication, on top of the time window
+MAX_RELEASED = 4096
+
+
+@dataclass
+class SourceStats:
+    connected: bool = False
+    received: int = 0
+    dropped: int = 0
+    duplicates: int = 0
+    selected: int = 0
+    last_rssi: Optional[float] = None
+    last_snr: Optional[float] = None
+    latencies_ms: deque = field(default_factory=lambda: deque(maxlen=256))
+
+    def summary(self) -> dict:
+        latencies = list(self.latencies_ms)
+        return {
+            "connected": self.connected,
+            "received": self.received,
+            "dropped": self.dropped,
+            "duplicates": self.duplicates,
+            "selected": self.selected,
+            "last_rssi": self.last_rssi,
+            "last_snr": self.last_snr,
+            "latency_ms_mean": sum(latencies) / len(latencies) if latencies else None,
+            "latency_ms_max": max(latencies) if latencies else None,
+        }
+
+
+@dataclass
+class _MergedPacket:
+    first_seen_ns: int
+    source: str
+    packet: RawPacket
+    # Every station that has contributed a copy of this transmission
+    sources: set[str] = field(default_factory=set)
+    released_ns: Optional[int] = None
+
+
+class PacketMerger:
+    """
+    Deduplicates packets heard by more than one station. The first copy of
+    a packet opens a merge window, and copies from other stations arriving
+    within it replace the held copy if their SNR is better. When the window
+    closes the best copy is released. Copies from other stations seen within
+    the dedup window are dropped as duplicates, but a station can't hear one
+    transmission twice, so a repeat from the same station is a new packet.
+    """
+
+    def __init__(
+        self,
+        stats: Dict[str, SourceStats],
+        merge_window_ns: int,
+        dedup_window_ns: int,
+        max_pending: int,
+    ) -> None:
+        self.stats = stats
+        self.merge_window_ns = merge_window_ns
+        self.dedup_window_ns = dedup_window_ns
+        self.max_pending = max_pending
+        # Packets still in their merge window, in order of first arrival
+        self._pending: deque[_MergedPacket] = deque()
+        # Latest packet for each payload, in order of first arrival
+        self._latest: OrderedDict[bytes, _MergedPacket] = OrderedDict()
+
+    def add(self, source: str, packet: RawPacket, now_ns: int) -> None:
+        self._expire(now_ns)
+        key = packet.data
+
+        merged = self._latest.get(key)
+        if merged is None or source in merged.sources:
+            merged = _MergedPacket(now_ns, source, packet, {source})
+            self._pending.append(merged)
+            self._latest[key] = merged
+            self._latest.move_to_end(key)
+            return
+
+        merged.sources.add(source)
+        if merged.released_ns is None and packet.snr > merged.packet.snr:
+            self.stats[merged.source].duplicates += 1
+            merged.source = source
+            merged.packet = packet
+        else:
+            self.stats[source].duplicates += 1
+
+    def release(self, now_ns: int) -> list[tuple[str, RawPacket]]:
+        """
+        Return the best copy of every packet whose merge window has closed,
+        oldest first. Packets are released early if too many are pending.
+        """
+        released = []
+        while self._pending:
+            merged = self._pending[0]
+            window_open = now_ns - merged.first_seen_ns < self.merge_window_ns
+            if window_open and len(self._pending) <= self.max_pending:
+                break
+            self._pending.popleft()
+            merged.released_ns = now_ns
+            self.stats[merged.source].selected += 1
+            released.append((merged.source, merged.packet))
+        return released
+
+    def _expire(self, now_ns: int) -> None:
+        while self._latest:
+            key, merged = next(iter(self._latest.items()))
+            if merged.released_ns is None:
+                break
+            expired = now_ns - merged.released_ns >= self.dedup_window_ns
+            if not expired and len(self._latest) <= MAX_RELEASED:
+                break
+            del self._latest[key]
+
+
+def parse_source(source: str) -> tuple[str, int]:
+    """
+    Split a host:port source into a socket address, raising ValueError if
+    it is malformed.
+    """
+    host, sep, port = source.rpartition(":")
+    if not sep or not host:
+        raise ValueError(f"expected host:port, got {source!r}")
+    if not port.isdigit() or not 0 < int(port) < 65536:
+        raise ValueError(f"invalid port in {source!r}")
+    return host, int(port)
+
+def source_reader(address: tuple[str, int], packet_queue: Queue, stats: SourceStats, stop_event: Event) -> None:
+    source = f"{address[0]}:{address[1]}"
+    while not stop_event.is_set():
+        try:
+            with socket.create_connection(address, timeout=2.0) as sock:
+                # Stalled peers mid-frame are treated as disconnected
+                sock.settimeout(5.0)
+                stats.connected = True
+                print(f"[INFO] Connected to {source}")
+                while not stop_event.is_set():
+                    readable, _, _ = select.select([sock], [], [], 1.0)
+                    if not readable:
+                        continue
+                    packet = read_frame(sock)
+                    if packet is None:
+                        break
+
+                    stats.received += 1
+                    stats.last_rssi = packet.rssi
+                    stats.last_snr = packet.snr
+                    # Assumes station clocks are synchronized (NTP or GPS)
+                    stats.latencies_ms.append((time.time_ns() - packet.rx_time_ns) / 1e6)
+                    try:
+                        packet_queue.put_nowait((source, packet))
+                    except Full:
+                        stats.dropped += 1
+                        print(f"[WARNING] Relay buffer is full. Dropping packet from {source}.")
+        except OSError as e:
+            if stats.connected:
+                print(f"[WARNING] Lost connection to {source}: {e}")
+        else:
+            if stats.connected and not stop_event.is_set():
+                print(f"[WARNING] {source} closed the connection")
+        stats.connected = False
+        stop_event.wait(1.0)
+
+def packet_merger(
+    packet_queue: Queue,
+    merger: PacketMerger,
+    rocket_channels: Dict,
+    stop_event: Event,
+    feed: FeedServer | None = None,
+) -> None:
+    timeout = max(merger.merge_window_ns / 2e9, 0.01)
+    while not stop_event.is_set():
+        try:
+            source, packet = packet_queue.get(timeout=timeout)
+            merger.add(source, packet, time.monotonic_ns())
+        except Empty:
+            pass
+
+        for source, packet in merger.release(time.monotonic_ns()):
+            route_packet(packet, rocket_channels)
+            if feed is not None:
+                feed.publish(packet)
+
+def stats_reporter(stats: Dict[str, SourceStats], stats_channel, interval: float, stop_event: Event) -> None:
+    while not stop_event.wait(interval):
+        summary = {source: source_stats.summary() for source, source_stats in stats.items()}
+        stats_channel.log(json.dumps(summary).encode())
+        for source, source_summary in summary.items():
+            print(f"[INFO] {source}: {source_summary}")
+
+def run_relay_loop(
+    packet_queue: Queue,
+    server: WebSocketServer,
+    merger: PacketMerger,
+    stats_interval: float,
+    rocket_ids: list[str] = [],
+    buffer_size: int = 0,
+    feed: FeedServer | None = None,
+) -> None:
+    from foxglove import Channel
+
+    rocket_channels = build_rocket_channels(rocket_ids, buffer_size)
+    stats_channel = Channel(topic="/relay/stats", message_encoding="json")
+
+    # Start publisher threads for each channel
+    start_channel_publishers(rocket_channels)
+
+    # Create and start the merger thread
+    merger_stop_event = Event()
+    merger_thread = threading.Thread(
+        target=packet_merger,
+        args=(packet_queue, merger, rocket_channels, merger_stop_event, feed),
+        name="packet-merger"
+    )
+    merger_thread.start()
+
+    # Create and start the stats thread
+    stats_stop_event = Event()
+    stats_thread = threading.Thread(
+        target=stats_reporter,
+        args=(merger.stats, stats_channel, stats_interval, stats_stop_event),
+        name="stats-reporter"
+    )
+    stats_thread.start()
+
+    try:
+        # Main thread just waits for interrupt
+        while True:
+            threading.Event().wait(1)
+
+    except KeyboardInterrupt:
+        print("\nShutting down threads...")
+        # Stop merger and stats threads
+        merger_stop_event.set()
+        merger_thread.join()
+        stats_stop_event.set()
+        stats_thread.join()
+
+        # Stop all publisher threads
+        stop_channel_publishers(rocket_channels)
+
+        server.stop()
+
+
+def main() -> None:
+    args = relay_parser.parse_args()
+
+    # Validate every source before starting any threads
+    sources: Dict[str, tuple[str, int]] = {}
+    for source in args.sources.split(","):
+        if not source.strip():
+            continue
+        try:
+            host, port = parse_source(source.strip())
+        except ValueError as e:
+            relay_parser.error(f"argument -s/--sources: {e}")
+        sources[f"{host}:{port}"] = (host, port)
+    if not sources:
+        relay_parser.error("argument -s/--sources: no sources given")
+
+    stats = {source: SourceStats() for source in sources}
+    packet_queue: Queue = Queue(maxsize=args.buffer_size)
+
+    # Subscribe to every station first so packets buffer while the server starts
+    sources_stop_event = Event()
+    source_threads = []
+    for source, address in sources.items():
+        thread = threading.Thread(
+            target=source_reader,
+            args=(address, packet_queue, stats[source], sources_stop_event),
+            name=f"{source}-reader"
+        )
+        thread.start()
+        source_threads.append(thread)
+
+    # Merged raw packets can be re-served to chain relays
+    if args.feed_port is not None:
+        feed = FeedServer(args.address, args.feed_port).start()
+        print(f"[INFO] Merged packet feed on port {feed.port}")
+    else:
+        feed = None
+
+    merger = PacketMerger(
+        stats,
+        merge_window_ns=args.merge_window_ms * 1_000_000,
+        dedup_window_ns=int(args.dedup_window_s * 1e9),
+        max_pending=args.buffer_size,
+    )
+
+    try:
+        server = start_server(args)
+        rocket_ids = args.rocket_name.split(',')
+
+        if args.enable_logging:
+            import foxglove
+
+            # Create logs directory if it doesn't exist
+            os.makedirs(args.log_dir, exist_ok=True)
+
+            # Create filename with current datetime
+            timestamp = datetime.now().strftime("%Y:%m:%d-%H:%M:%S")
+            path = os.path.join(args.log_dir, f"{args.rocket_name}-relay-{timestamp}.mcap")
+
+            with foxglove.open_mcap(path):
+                run_relay_loop(
+                    packet_queue, server, merger, args.stats_interval,
+                    rocket_ids, args.buffer_size, feed
+                )
+        else:
+            run_relay_loop(
+                packet_queue, server, merger, args.stats_interval,
+                rocket_ids, args.buffer_size, feed
+            )
+    finally:
+        # Stop source threads
+        sources_stop_event.set()
+        for thread in source_threads:
+            thread.join()
+
+        if feed is not None:
+            feed.stop()
+
+        for source, source_stats in stats.items():
+            print(f"[INFO] {source}: {source_stats.summary()}")
+
+
+if __name__ == "__main__":
+    main()
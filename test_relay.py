@@ -0,0 +1,64 @@
+from feed import RawPacket
+from relay import PacketMerger, SourceStats
+
+MS = 1_000_000
+
+
+def make_merger(max_pending: int = 16) -> PacketMerger:
+    stats = {"a": SourceStats(), "b": SourceStats()}
+    return PacketMerger(
+        stats,
+        merge_window_ns=100 * MS,
+        dedup_window_ns=5_000 * MS,
+        max_pending=max_pending,
+    )
+
+
+def packet(data: bytes, snr: float = 5.0) -> RawPacket:
+    return RawPacket(data=data, rssi=-80.0, snr=snr, rx_time_ns=0)
+
+
+def test_same_source_repeat_is_a_new_packet():
+    merger = make_merger()
+
+    merger.add("a", packet(b"x"), 0)
+    merger.add("a", packet(b"x"), 10 * MS)
+    assert len(merger.release(200 * MS)) == 2
+
+    merger.add("a", packet(b"x"), 1_000 * MS)
+    assert len(merger.release(1_200 * MS)) == 1
+    assert merger.stats["a"].duplicates == 0
+    assert merger.stats["a"].selected == 3
+
+
+def test_cross_source_copy_keeps_best_snr():
+    merger = make_merger()
+
+    merger.add("a", packet(b"x", snr=2.0), 0)
+    merger.add("b", packet(b"x", snr=9.0), 20 * MS)
+    assert merger.release(50 * MS) == []
+
+    released = merger.release(200 * MS)
+    assert [(source, p.snr) for source, p in released] == [("b", 9.0)]
+    assert merger.stats["a"].duplicates == 1
+
+
+def test_late_cross_source_copy_is_a_duplicate():
+    merger = make_merger()
+
+    merger.add("a", packet(b"x"), 0)
+    assert len(merger.release(200 * MS)) == 1
+
+    merger.add("b", packet(b"x", snr=20.0), 1_000 * MS)
+    assert merger.release(1_200 * MS) == []
+    assert merger.stats["b"].duplicates == 1
+
+
+def test_max_pending_releases_early():
+    merger = make_merger(max_pending=2)
+
+    for i in range(3):
+        merger.add("a", packet(bytes([i])), 0)
+
+    released = merger.release(1 * MS)
+    assert [p.data for _, p in released] == [b"\x00"]